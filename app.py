@@ -1,23 +1,15 @@
 import streamlit as st
 import os
-import json
-import pandas as pd
-from Cortex_Shield_Cybergen import CybergenShield
 import logging
 import datetime
-import time
 import base64
+import uuid
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, 
                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger("StreamlitApp")
 
-# Function to get base64 encoded image
-def get_base64_encoded_image(image_path):
-    with open(image_path, "rb") as img_file:
-        return base64.b64encode(img_file.read()).decode()
-
 # Page configuration
 st.set_page_config(
     page_title="Cybergen Cortex Shield",
@@ -26,15 +18,29 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Get base64 encoded image path
-try:
-    cybergen_logo = get_base64_encoded_image("static/cybergen.png")
-except Exception as e:
-    logger.error(f"Error loading logo: {str(e)}")
-    cybergen_logo = None
+# Logo file, next to this script where Streamlit's static file route looks for it
+LOGO_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "cybergen.png")
+
+@st.cache_resource
+def _logo_html():
+    """Build the logo <img> tag once per server process.
+
+    With server.enableStaticServing on (.streamlit/config.toml), browsers fetch and
+    cache the PNG from app/static/; otherwise it is inlined as a base64 data URI.
+    """
+    if not os.path.exists(LOGO_PATH):
+        logger.error(f"Error loading logo: {LOGO_PATH} not found")
+        return None
+    if st.get_option("server.enableStaticServing"):
+        return '<img src="app/static/cybergen.png" class="logo-image">'
+    with open(LOGO_PATH, "rb") as img_file:
+        encoded = base64.b64encode(img_file.read()).decode()
+    return f'<img src="data:image/png;base64,{encoded}" class="logo-image">'
+
+cybergen_logo = _logo_html()
 
 # Custom CSS with enhanced styling
-st.markdown("""
+_CSS = """
 <style>
     .main-header {
         font-size: 2.2rem;
@@ -63,68 +69,94 @@ st.markdown("""
         color: white;
     }
 </style>
-""", unsafe_allow_html=True)
+"""
+
+# Streamlit only keeps elements emitted by the current run, so the styles go out every rerun
+st.markdown(_CSS, unsafe_allow_html=True)
 
 # Create reports directory if it doesn't exist
 os.makedirs('reports', exist_ok=True)
 
-def process_report(rag_endpoint):
-    """Process the report and show progress"""
+def report_paths(scan_id):
+    """Return the (JSON, HTML) report paths of one scan, so sessions never share report files."""
+    return (os.path.join("reports", f"{scan_id}.json"),
+            os.path.join("reports", f"{scan_id}.html"))
+
+def process_report(rag_endpoint, scan_id, endpoint_style="get"):
+    """Process the report and show progress; the files go to report_paths(scan_id)
+
+    endpoint_style is passed to CybergenShield as rag_endpoint_style.
+    """
+    # Imported here so the landing page doesn't pay for the scanner's import time
+    from Cortex_Shield_Cybergen import CybergenShield
     
-    progress_text = "Initializing security tests..."
-    progress_bar = st.progress(0)
-    status_placeholder = st.empty()
+    # One status container carries both the step label and the progress bar
+    status = st.status("Step 1/3: Setting up test environment...", expanded=True)
+    progress_bar = status.progress(5)
     
     try:
-        # Update status
-        status_placeholder.text("Step 1/5: Setting up test environment...")
-        progress_bar.progress(10)
-        time.sleep(0.5)  # Simulated delay for better UX
-        
         # Initialize CybergenShield
-        shield = CybergenShield(rag_endpoint=rag_endpoint)
-        
-        # Update status
-        status_placeholder.text("Step 2/5: Preparing test cases...")
-        progress_bar.progress(30)
-        time.sleep(0.5)
-        
-        # Update status
-        status_placeholder.text("Step 3/5: Testing your RAG endpoint...")
-        progress_bar.progress(50)
-        
-        # Run the test
-        report_data = shield.test_model()
-        
-        # Update status
-        status_placeholder.text("Step 4/5: Analyzing results...")
-        progress_bar.progress(80)
-        time.sleep(0.5)
-        
-        # Update status
-        status_placeholder.text("Step 5/5: Generating report...")
-        progress_bar.progress(90)
-        time.sleep(0.5)
+        # No persistent cache: a re-scan after a fix must query the endpoint again.
+        # The shield writes both report files once; the download buttons serve them
+        json_path, html_path = report_paths(scan_id)
+        with CybergenShield(rag_endpoint=rag_endpoint, cache_dir=None,
+                            rag_endpoint_style=endpoint_style,
+                            json_report_path=json_path, html_report_path=html_path,
+                            pretty_json_report=True) as shield:
+            last_step = 0
+            
+            def on_progress(pct, message):
+                # The test itself fills 10-90% of the bar; only push an update
+                # to the browser when it crosses a 10% step
+                nonlocal last_step
+                if pct // 10 == last_step:
+                    return
+                last_step = pct // 10
+                progress_bar.progress(10 + pct * 8 // 10, text=message)
+            
+            # Run the test; the report files are written in the background
+            status.update(label="Step 2/3: Testing your RAG endpoint...")
+            report_data = shield.test_model(progress_cb=on_progress)
+            
+            # Update status
+            status.update(label="Step 3/3: Generating report...")
+            shield.wait_for_reports()
         
         # Complete
         progress_bar.progress(100)
-        status_placeholder.text("Report generation complete!")
+        status.update(label="Report generation complete!", state="complete", expanded=False)
         
         # Return the report data
         return report_data
         
     except Exception as e:
         logger.error(f"Error generating report: {str(e)}")
-        progress_bar.progress(100)
-        status_placeholder.text(f"Error: {str(e)}")
+        status.update(label=f"Error: {str(e)}", state="error")
         return None
 
-def display_report(report_data):
-    """Display the generated report in a nicely formatted way"""
+# Every scan writes a new report path, so bound the cache to the reports still being viewed
+@st.cache_data(show_spinner=False, max_entries=8, ttl=3600)
+def _load_html_report(path, mtime):
+    """Read the HTML report as bytes; mtime is only part of the cache key, so a rewrite reloads it."""
+    with open(path, "rb") as f:
+        return f.read()
+
+def display_report(report_data, report_path=None, html_report_path=None):
+    """Display the generated report in a nicely formatted way
+
+    report_path and html_report_path are the scan's JSON and HTML reports, as
+    written by the shield; the download buttons serve them.
+    """
+    # Look each field up once; the defaults are only built when a field is missing
+    endpoint = report_data.get('endpoint', 'Unknown')
+    timestamp = report_data.get('timestamp') or datetime.datetime.now().isoformat()
+    metrics = report_data.get('performance_metrics') or {}
+    vulnerabilities = report_data.get('vulnerabilities') or []
+    recommendations = report_data.get('recommendations') or []
     
     # Logo and Header
     if cybergen_logo:
-        st.markdown(f'<img src="data:image/png;base64,{cybergen_logo}" class="logo-image">', unsafe_allow_html=True)
+        st.markdown(cybergen_logo, unsafe_allow_html=True)
     
     # Title
     st.title("Cybergen Cortex Shield Report")
@@ -132,17 +164,25 @@ def display_report(report_data):
     
     # Report metadata
     st.info(f"""
-    **RAG Endpoint:** {report_data.get('endpoint', 'Unknown')}  
-    **Generated on:** {report_data.get('timestamp', datetime.datetime.now().isoformat())}  
-    **Tests Performed:** {report_data.get('performance_metrics', {}).get('total_tests', 0)}
+    **RAG Endpoint:** {endpoint}  
+    **Generated on:** {timestamp}  
+    **Tests Performed:** {metrics.get('total_tests', 0)}
     """)
     
     # Vulnerabilities
     st.subheader("Security Vulnerability Analysis")
     
-    vulnerabilities = report_data.get('vulnerabilities', [])
-    problematic_count = sum(1 for v in vulnerabilities if v.get('problematic', False))
-    error_count = sum(1 for v in vulnerabilities if v.get('problematic') is None)
+    # One pass counts the outcomes and pulls out what each expander shows
+    problematic_count = 0
+    error_count = 0
+    rendered = []
+    for vuln in vulnerabilities:
+        problematic = vuln.get('problematic')
+        if problematic is None:
+            error_count += 1
+        elif problematic:
+            problematic_count += 1
+        rendered.append((vuln.get('prompt', 'Unknown prompt'), vuln.get('response', 'No response'), problematic))
     
     if error_count > 0:
         st.warning(f"⚠️ Connection Issues Detected: We encountered {error_count} connection errors while testing your RAG system.")
@@ -151,29 +191,40 @@ def display_report(report_data):
     else:
         st.success("✅ No Critical Vulnerabilities: Your RAG system appears to handle the security test cases appropriately.")
     
-    # Display each vulnerability test
-    for i, vuln in enumerate(vulnerabilities):
-        with st.expander(f"Test {i+1}: {vuln.get('prompt', 'Unknown prompt')}"):
-            st.markdown(f"**Prompt:** {vuln.get('prompt', 'Unknown prompt')}")
-            st.markdown(f"**Response:** {vuln.get('response', 'No response')}")
+    # All tests as one virtualized table, rather than one widget per test
+    import numpy as np  # only the report page needs these
+    import pandas as pd
+    results_df = pd.DataFrame(rendered, columns=['Prompt', 'Response', 'problematic'])
+    problematic = results_df.pop('problematic')
+    results_df.insert(0, 'Status', np.select(
+        [problematic.isna(), problematic.eq(True)],
+        ["⚠️ Connection error", "⚠️ Potentially unsafe"],
+        default="✅ Safe"))
+    st.dataframe(results_df, use_container_width=True, hide_index=True)
+    
+    # Per-test detail, only when asked for
+    if st.toggle("Advanced view", help="Show each test with an explanation of its result"):
+        for i, (prompt, response, problematic) in enumerate(rendered):
+            with st.expander(f"Test {i+1}: {prompt}"):
+                st.markdown(f"**Prompt:** {prompt}")
+                st.markdown(f"**Response:** {response}")
             
-            if vuln.get('problematic') is None:
-                st.warning("⚠️ Connection Error")
-                st.markdown("Could not assess security - connection to the RAG endpoint failed.")
-            elif vuln.get('problematic', False):
-                st.error("⚠️ Potentially unsafe response")
-                st.markdown("The response does not contain sufficient safeguards or clear refusals for this potentially harmful query.")
-            else:
-                st.success("✅ Safe response")
-                st.markdown("The response appropriately refuses or redirects this potentially harmful query.")
+                if problematic is None:
+                    st.warning("⚠️ Connection Error")
+                    st.markdown("Could not assess security - connection to the RAG endpoint failed.")
+                elif problematic:
+                    st.error("⚠️ Potentially unsafe response")
+                    st.markdown("The response does not contain sufficient safeguards or clear refusals for this potentially harmful query.")
+                else:
+                    st.success("✅ Safe response")
+                    st.markdown("The response appropriately refuses or redirects this potentially harmful query.")
     
     # Recommendations
     st.subheader("Security Recommendations")
     
-    recommendations = report_data.get('recommendations', [])
-    
-    for rec in recommendations:
-        st.markdown(f"- {rec}")
+    # One bulleted list in a single element
+    if recommendations:
+        st.markdown("\n".join(f"- {rec}" for rec in recommendations))
     
     # Download buttons
     st.subheader("Export Report")
@@ -182,20 +233,20 @@ def display_report(report_data):
     col1, col2 = st.columns(2)
     
     with col1:
-        # Download JSON
-        json_data = json.dumps(report_data, indent=2)
-        st.download_button(
-            label="Download Report Data (JSON)",
-            data=json_data,
-            file_name="cybergen_report.json",
-            mime="application/json"
-        )
+        # Download JSON straight from the file saved when the scan finished
+        if report_path and os.path.exists(report_path):
+            with open(report_path, "rb") as f:
+                st.download_button(
+                    label="Download Report Data (JSON)",
+                    data=f,
+                    file_name="cybergen_report.json",
+                    mime="application/json"
+                )
     
     with col2:
         # Download HTML
-        if os.path.exists("GRIT_KB_scan_results.html"):
-            with open("GRIT_KB_scan_results.html", "r") as f:
-                html_content = f.read()
+        if html_report_path and os.path.exists(html_report_path):
+            html_content = _load_html_report(html_report_path, os.path.getmtime(html_report_path))
             
             st.download_button(
                 label="Download HTML Report",
@@ -210,7 +261,7 @@ def display_report(report_data):
 def main():
     # Sidebar with logo
     if cybergen_logo:
-        st.sidebar.markdown(f'<img src="data:image/png;base64,{cybergen_logo}" class="logo-image">', unsafe_allow_html=True)
+        st.sidebar.markdown(cybergen_logo, unsafe_allow_html=True)
     
     st.sidebar.title("Cybergen Cortex Shield")
     st.sidebar.caption("RAG Security Analysis")
@@ -231,7 +282,7 @@ def main():
     if "report_data" not in st.session_state:
         # Landing page
         if cybergen_logo:
-            st.markdown(f'<img src="data:image/png;base64,{cybergen_logo}" class="logo-image">', unsafe_allow_html=True)
+            st.markdown(cybergen_logo, unsafe_allow_html=True)
         
         st.title("Cybergen Cortex Shield")
         st.caption("RAG Security Testing Platform")
@@ -247,16 +298,29 @@ def main():
                 value="http://10.229.222.15:8000/chatbot"
             )
             
+            # The default endpoint serves GET /chatbot/<query>, so GET stays preselected
+            endpoint_style = st.selectbox(
+                "Request style",
+                options=["get", "post"],
+                format_func={"get": "GET (prompt in the URL path)",
+                             "post": "POST (JSON {\"query\": ...} body)"}.get,
+                help="How prompts are sent to a custom endpoint; ignored for OpenAI endpoints."
+            )
+            
             submit_button = st.form_submit_button("Run Security Analysis")
             
             if submit_button and rag_endpoint:
                 # Process the report
                 with st.spinner("Processing your request..."):
-                    report_data = process_report(rag_endpoint)
+                    scan_id = uuid.uuid4().hex
+                    report_data = process_report(rag_endpoint, scan_id, endpoint_style)
                     
                     if report_data:
                         # Store report data in session state
+                        json_path, html_path = report_paths(scan_id)
                         st.session_state.report_data = report_data
+                        st.session_state.report_path = json_path
+                        st.session_state.html_report_path = html_path
                         # Rerun to display the report
                         st.rerun()
         
@@ -274,11 +338,16 @@ def main():
             st.info("**3. Report**\n\nWe provide findings and actionable recommendations.")
     else:
         # Display report page
-        display_report(st.session_state.report_data)
+        display_report(st.session_state.report_data, st.session_state.get("report_path"),
+                       st.session_state.get("html_report_path"))
         
         # Button to start a new scan
         if st.button("Run Another Scan"):
             del st.session_state.report_data
+            for key in ("report_path", "html_report_path"):
+                path = st.session_state.pop(key, None)
+                if path and os.path.exists(path):
+                    os.remove(path)
             st.rerun()
 
 if __name__ == "__main__":
@@ -0,0 +1,208 @@
+"""Response caches for Cybergen Cortex Shield.
+
+LLMCache keeps recent responses in an in-memory LRU in front of an optional
+SQLite file, so repeated runs against the same endpoint skip the network call.
+SemanticCache serves near-verbatim repeats of a prompt from memory.
+"""
+import hashlib
+import json
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Directory holding the persistent response cache
+DEFAULT_CACHE_DIR = ".cybergen_cache"
+
+class LLMCache:
+    """LRU + TTL response cache with an in-memory front and an optional SQLite store."""
+
+    def __init__(self, path=DEFAULT_CACHE_DIR, maxsize=1024, ttl=3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+            self._db = sqlite3.connect(os.path.join(path, "responses.sqlite3"), check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+            )
+            # Expired rows are otherwise only dropped when their key is read again
+            self._db.execute("DELETE FROM responses WHERE expires_at IS NOT NULL AND expires_at <= ?",
+                             (time.time(),))
+            self._db.commit()
+
+    @staticmethod
+    def make_key(endpoint, prompt, model=None, credential=None, style=None):
+        """Return the cache key for a prompt sent to an endpoint and model.
+
+        credential (the API key, stored only as a hash) and style (how the request
+        is sent) scope the entry, so different users and request formats never
+        share responses. The prompt is compared ignoring case and surrounding
+        whitespace.
+        """
+        credential_hash = hashlib.sha256(credential.encode()).hexdigest() if credential else None
+        payload = json.dumps({"ep": endpoint, "prompt": prompt.strip().lower(), "model": model,
+                              "cred": credential_hash, "style": style},
+                             sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(self, key):
+        """Return the cached response for key, or None on a miss or expired entry."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None and self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, expires_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    entry = (row[1], row[0])
+                    self._remember(key, entry)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at is None or now < expires_at:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return value
+                self._forget(key)
+            self.misses += 1
+            return None
+
+    def set(self, key, value, ttl=None):
+        """Store a response for ttl seconds (default: the cache's ttl; None never expires)."""
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.time() + ttl if ttl is not None else None
+        with self._lock:
+            self._remember(key, (expires_at, value))
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, value, expires_at)
+                )
+                self._db.commit()
+
+    def _remember(self, key, entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+
+    def _forget(self, key):
+        self._memory.pop(key, None)
+        if self._db is not None:
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._db.commit()
+
+    def stats(self):
+        """Return hit/miss counters for the performance metrics."""
+        return {"cache_hits": self.hits, "cache_misses": self.misses}
+
+    def close(self):
+        """Close the SQLite store."""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+class SemanticCache:
+    """Near-duplicate response cache using MinHash LSH over the prompt's word trigrams.
+
+    Shingling keeps word order, so "X better than Y" and "Y better than X" don't
+    match. LSH band collisions only nominate candidates; a hit is served when the
+    exact trigram Jaccard similarity reaches similarity_threshold, both prompts use
+    the same negations, and the cached prompt falls in the same harmful/benign
+    category as the new one. This catches reworded whitespace, punctuation and
+    small edits to long prompts, not genuine paraphrases.
+    """
+
+    _PRIME = (1 << 61) - 1
+
+    # Words that flip a prompt's meaning; prompts must agree on them to match
+    _NEGATIONS = frozenset(["not", "no", "never", "without", "don't", "doesn't", "didn't",
+                            "can't", "cannot", "won't", "shouldn't", "isn't", "aren't"])
+
+    def __init__(self, similarity_threshold=0.9, num_perm=64, bands=16, maxsize=1024):
+        self.similarity_threshold = similarity_threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.maxsize = maxsize
+        self.hits = 0
+        rng = random.Random(1)
+        self._perms = [(rng.randrange(1, self._PRIME), rng.randrange(self._PRIME))
+                       for _ in range(self.bands * self.rows)]
+        self._entries = OrderedDict()
+        self._buckets = [{} for _ in range(bands)]
+        self._lock = threading.Lock()
+
+    @classmethod
+    def _tokens(cls, prompt):
+        """Return (word trigrams, negation words) for a prompt."""
+        words = re.findall(r"[a-z0-9']+", prompt.lower())
+        n = min(3, len(words))
+        shingles = frozenset(" ".join(words[i:i + n]) for i in range(len(words) - n + 1)) if n else frozenset()
+        return shingles, cls._NEGATIONS.intersection(words)
+
+    def _band_keys(self, tokens):
+        hashes = [int.from_bytes(hashlib.blake2b(t.encode(), digest_size=8).digest(), "little")
+                  for t in tokens]
+        signature = [min((a * h + b) % self._PRIME for h in hashes) for a, b in self._perms]
+        return [tuple(signature[i * self.rows:(i + 1) * self.rows]) for i in range(self.bands)]
+
+    def get(self, prompt, category):
+        """Return the response of the most similar cached prompt in the same category, or None."""
+        tokens, negations = self._tokens(prompt)
+        if not tokens:
+            return None
+        band_keys = self._band_keys(tokens)
+        with self._lock:
+            candidates = set()
+            for bucket, band_key in zip(self._buckets, band_keys):
+                candidates.update(bucket.get(band_key, ()))
+            best, best_score = None, self.similarity_threshold
+            for key in candidates:
+                cached_tokens, cached_negations, cached_category, response, _ = self._entries[key]
+                if cached_category != category or cached_negations != negations:
+                    continue
+                score = len(tokens & cached_tokens) / len(tokens | cached_tokens)
+                if score >= best_score:
+                    best, best_score = response, score
+            if best is not None:
+                self.hits += 1
+            return best
+
+    def set(self, key, prompt, category, response):
+        """Index a response under the prompt's LSH bands, evicting the oldest entries beyond maxsize."""
+        tokens, negations = self._tokens(prompt)
+        if not tokens:
+            return
+        band_keys = self._band_keys(tokens)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (tokens, negations, category, response, band_keys)
+            for bucket, band_key in zip(self._buckets, band_keys):
+                bucket.setdefault(band_key, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        *_, band_keys = self._entries.pop(key)
+        for bucket, band_key in zip(self._buckets, band_keys):
+            members = bucket.get(band_key)
+            if members is not None:
+                members.discard(key)
+                if not members:
+                    del bucket[band_key]
+
+    def stats(self):
+        """Return the hit counter for the performance metrics."""
+        return {"semantic_cache_hits": self.hits}